@@ -1,48 +1,28 @@
 from __future__ import annotations
 
-import os
-from pathlib import Path
 from typing import Optional
 
-from pydantic import BaseModel, RootModel
+from pydantic import Field
+from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
-class Settings(BaseModel):
-    """Application settings loaded from environment variables."""
+class Settings(BaseSettings):
+    """Application settings loaded and validated from environment variables.
 
-    ee_service_account: str
-    algeria_asset_id: str = "projects/ee-bensefiasofian/assets/Maine"
-    default_buffer_m: int = 10000
+    ``frozen=True`` keeps the instance immutable (and hashable), and the
+    validation aliases preserve the environment variable names the service
+    has always used.
+    """
 
-    @classmethod
-    def from_env(cls, env: Optional[dict[str, str]] = None) -> "Settings":
-        data = env or os.environ
+    model_config = SettingsConfigDict(frozen=True)
 
-        # لم نعد نحتاج EE_CREDENTIALS_PATH
-        service_account = data.get("EE_SERVICE_ACCOUNT")
-        if not service_account:
-            raise ValueError(
-                "EE_SERVICE_ACCOUNT environment variable is required and must contain the Earth Engine service account email."
-            )
+    ee_service_account: str = Field(validation_alias="EE_SERVICE_ACCOUNT")
+    algeria_asset_id: str = Field(
+        default="projects/ee-bensefiasofian/assets/Maine",
+        validation_alias="ALGERIA_REGION_ASSET",
+    )
+    default_buffer_m: int = Field(default=10000, validation_alias="EE_DEFAULT_BUFFER_M")
+    redis_url: Optional[str] = Field(default=None, validation_alias="REDIS_URL")
 
-        return cls(
-            ee_service_account=service_account,
-            algeria_asset_id=data.get(
-                "ALGERIA_REGION_ASSET",
-                "projects/ee-bensefiasofian/assets/Maine",
-            ),
-            default_buffer_m=int(data.get("EE_DEFAULT_BUFFER_M", "10000")),
-        )
 
-
-class SettingsContainer(RootModel[Settings]):
-    """Helper wrapper so settings can be injected as a dependency in FastAPI."""
-
-    root: Settings
-
-    @property
-    def settings(self) -> Settings:
-        return self.root
-
-
-settings = Settings.from_env()
+settings = Settings()
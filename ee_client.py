@@ -5,11 +5,26 @@ import os
 from functools import lru_cache
 
 import ee
+import requests
+from requests.adapters import HTTPAdapter
 
 from config import settings  # استيراد مطلق
 
 logger = logging.getLogger(__name__)
 
+# The analysis fans EE calls out over worker threads, and requests' default
+# adapter only keeps 10 connections alive — anything beyond that pays a fresh
+# TLS handshake. Size the pool to comfortably cover the thread fan-out.
+_POOL_SIZE = 16
+
+
+def _pooled_session() -> requests.Session:
+    """A keep-alive session for EE's API calls, sized for the thread fan-out."""
+
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(pool_connections=_POOL_SIZE, pool_maxsize=_POOL_SIZE))
+    return session
+
 
 def initialize_earth_engine() -> None:
     """Initialise the Earth Engine client using the configured service account."""
@@ -37,13 +52,23 @@ def initialize_earth_engine() -> None:
         service_account,
         key_data=private_key,
     )
+    # Install the pooled session before Initialize; ee.data only creates its
+    # own default session when none is present.
+    ee.data._requests_session = _pooled_session()  # pylint: disable=protected-access
     ee.Initialize(credentials)
 
 
 @lru_cache(maxsize=1)
 def get_algeria_geometry() -> ee.Geometry:
-    """Return the geometry of the Algeria study area asset."""
+    """Return the geometry of the Algeria study area asset.
+
+    ``.geometry()`` alone is a deferred server-side expression, so every
+    downstream ``intersection`` would re-run the asset dissolve on EE. The
+    coordinates are fetched once here and rebuilt as a constant client-side
+    geometry, which subsequent requests reuse via the cache.
+    """
 
     initialize_earth_engine()
-    feature_collection = ee.FeatureCollection(settings.algeria_asset_id)
-    return feature_collection.geometry()
+    geometry_info = ee.FeatureCollection(settings.algeria_asset_id).geometry().getInfo()
+    # GeoJSON round-trip handles both Polygon and MultiPolygon assets.
+    return ee.Geometry(geometry_info)
@@ -1,16 +1,20 @@
 from __future__ import annotations
 
+import asyncio
 import logging
-from functools import lru_cache
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
 
-from fastapi import Depends, FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 
 # استيرادات مطلقة بدل النسبية
-from config import Settings, settings
+from config import settings
+from ee_client import initialize_earth_engine
 from models import AnalysisRequest, AnalysisResponse
 from services.analysis_service import run_analysis
+from services.url_cache import url_cache
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
@@ -22,13 +26,22 @@ class HealthResponse(BaseModel):
     region_asset: str
 
 
-@lru_cache(maxsize=1)
-def get_settings() -> Settings:
-    return settings
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Initialise Earth Engine once at startup, off the event loop.
+
+    Doing this here instead of at module import keeps uvicorn startup and
+    endpoints that never touch EE (like /health) free of the network handshake.
+    """
+
+    await asyncio.to_thread(initialize_earth_engine)
+    await asyncio.to_thread(url_cache.connect)
+    yield
+    await asyncio.to_thread(url_cache.disconnect)
 
 
 def create_app() -> FastAPI:
-    app = FastAPI(title="Reservoir Analyzer GIS API", version="1.0.0")
+    app = FastAPI(title="Reservoir Analyzer GIS API", version="1.0.0", lifespan=lifespan)
 
     app.add_middleware(
         CORSMiddleware,
@@ -39,11 +52,11 @@ def create_app() -> FastAPI:
     )
 
     @app.get("/health", response_model=HealthResponse)
-    async def health_check(config: Settings = Depends(get_settings)) -> HealthResponse:
+    async def health_check() -> HealthResponse:
         return HealthResponse(
             status="ok",
-            service_account=config.ee_service_account,
-            region_asset=config.algeria_asset_id,
+            service_account=settings.ee_service_account,
+            region_asset=settings.algeria_asset_id,
         )
 
     @app.post("/analysis", response_model=AnalysisResponse)
@@ -55,7 +68,9 @@ def create_app() -> FastAPI:
                 request.longitude,
                 request.buffer_meters,
             )
-            return run_analysis(request)
+            # run_analysis issues blocking EE round-trips; keep them off the
+            # event loop so concurrent requests don't serialize behind it.
+            return await asyncio.to_thread(run_analysis, request)
         except Exception as exc:
             logger.exception("Analysis failed")
             raise HTTPException(status_code=500, detail=str(exc)) from exc
@@ -1,13 +1,14 @@
 from __future__ import annotations
 
+import math
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
-from typing import Dict, List
+from typing import Dict, List, Mapping, Optional, Tuple
 
 import ee
 
 # FIXED IMPORTS — absolute imports instead of relative
-from config import settings
-from ee_client import get_algeria_geometry, initialize_earth_engine
+from ee_client import get_algeria_geometry
 from models import (
     AnalysisRequest,
     AnalysisResponse,
@@ -15,10 +16,31 @@ from models import (
     LayerResult,
     LayerStatistics
 )
-from services.layer_definitions import ComputedLayer, LAYER_DEFINITIONS
+from services.layer_definitions import (
+    LAYER_DEFINITIONS,
+    LayerDefinition,
+    build_layer_context,
+)
+from services.url_cache import url_cache
+
+
+# EE requests are network-bound, so fan the layers out over a thread pool instead
+# of paying each round-trip sequentially. Bounded to stay under EE's per-project
+# concurrency limit.
+_MAX_LAYER_WORKERS = min(len(LAYER_DEFINITIONS), 8)
 
+# Pixel budget for the batched reduction. The reducer scale is widened with
+# the buffer radius so the reduced pixel count stays near this budget instead
+# of leaving bestEffort to downsample aggressively for 50 km regions.
+_MAX_REDUCE_PIXELS = 1_000_000
 
-initialize_earth_engine()
+# (rounded latitude, rounded longitude, buffer in metres) — enough to identify
+# the analysis region for cache purposes.
+RegionKey = Tuple[float, float, int]
+
+
+def _region_key(request: AnalysisRequest) -> RegionKey:
+    return (round(request.latitude, 4), round(request.longitude, 4), request.buffer_meters)
 
 
 def _create_analysis_region(request: AnalysisRequest) -> ee.Geometry:
@@ -26,4 +48,205 @@ def _create_analysis_region(request: AnalysisRequest) -> ee.Geometry:
 
     study_area = get_algeria_geometry()
     point = ee.Geometry.Point([request.longitude, request.latitude])
-    buffered = poi
+    buffered = point.buffer(request.buffer_meters)
+    return buffered.intersection(study_area, ee.ErrorMargin(1))
+
+
+_CLASS_LABELS = ("low", "moderate", "high")
+
+# The static LayerPreview fields never change between requests, so validating
+# them through Pydantic for every layer on every request is wasted work. They
+# are frozen into per-layer templates once at import; model_construct then
+# skips validation and only the per-request URLs are overlaid.
+_PREVIEW_TEMPLATES: Dict[str, Dict[str, object]] = {
+    definition.id: {
+        "id": definition.id,
+        "name": definition.name,
+        "description": definition.description,
+        "legend_min": definition.min_value,
+        "legend_max": definition.max_value,
+        "legend_units": definition.units,
+        # model_construct skips coercion, so match the declared list[str] here
+        # rather than leaking the definition's tuple into serialization.
+        "palette": list(definition.palette),
+    }
+    for definition in LAYER_DEFINITIONS
+}
+
+
+def _target_scale(buffer_m: int) -> int:
+    """Choose a reducer scale fitting the buffered region into the pixel budget.
+
+    Floored at the finest native layer scale so small buffers keep full
+    resolution; for larger buffers the adaptive term grows the scale just
+    enough to keep the pixel count near the budget (~90 m at the 50 km cap).
+    """
+
+    native = min(definition.scale for definition in LAYER_DEFINITIONS)
+    adaptive = int(math.sqrt(buffer_m**2 * math.pi / _MAX_REDUCE_PIXELS))
+    return max(native, adaptive)
+
+
+def _reduce_all_layers(
+    layer_images: List[ee.Image], region: ee.Geometry, buffer_m: int
+) -> Tuple[float, Dict[str, object]]:
+    """Reduce the region area plus every layer's statistics in a single EE call.
+
+    All layers share the same region, so stacking their images and reducing
+    the stack once collapses eleven round-trips into one. A fixedHistogram
+    over 0-100 in three buckets yields the low/moderate/high breakdown for
+    classified layers without building a separate classification image. The
+    stack is reduced at a scale adapted to the buffer size (never finer than
+    the finest layer scale), and tileScale=4 shards the reduction
+    server-side. The region area rides along in the same ee.Dictionary,
+    sparing its own round-trip.
+    """
+
+    reducer = (
+        ee.Reducer.mean()
+        .combine(ee.Reducer.minMax(), sharedInputs=True)
+        .combine(ee.Reducer.stdDev(), sharedInputs=True)
+        # Buckets cover [min, max), and the clamped percentage layers put real
+        # mass exactly at 100 — nudge the upper edge so it lands in "high".
+        .combine(ee.Reducer.fixedHistogram(0, 100.0001, 3), sharedInputs=True)
+    )
+
+    stack = ee.Image.cat(layer_images)
+    stats = stack.reduceRegion(
+        reducer=reducer,
+        geometry=region,
+        scale=_target_scale(buffer_m),
+        maxPixels=_MAX_REDUCE_PIXELS,
+        bestEffort=True,
+        tileScale=4,
+    )
+    combined = ee.Dictionary(
+        {"area_sqkm": region.area().divide(1_000_000), "stats": stats}
+    ).getInfo()
+    return combined["area_sqkm"], combined["stats"]
+
+
+def _layer_metrics(
+    definition: LayerDefinition, batch_results: Dict[str, object]
+) -> tuple[LayerStatistics, Optional[Dict[str, float]]]:
+    """Pick one layer's statistics and histogram out of the batched reduction."""
+
+    band = definition.id
+    statistics = LayerStatistics(
+        mean=batch_results.get(f"{band}_mean") or 0.0,
+        min=batch_results.get(f"{band}_min") or 0.0,
+        max=batch_results.get(f"{band}_max") or 0.0,
+        stdDev=batch_results.get(f"{band}_stdDev") or 0.0,
+    )
+
+    classification_summary: Optional[Dict[str, float]] = None
+    if definition.classified:
+        # fixedHistogram rows are (bucket_start, count) for the 0-33/33-66/66-100 bins.
+        rows = batch_results.get(f"{band}_histogram") or []
+        total = sum(count for _, count in rows) or 1.0
+        classification_summary = {
+            _CLASS_LABELS[index]: round(100.0 * count / total, 2)
+            for index, (_, count) in enumerate(rows)
+        }
+    return statistics, classification_summary
+
+
+def _build_tile_url(image: ee.Image, vis_params: Mapping[str, object]) -> str:
+    """Build a Google-Maps-compatible tile URL template for the styled image.
+
+    getMapId already returns a ready-made template pointing at EE's tile CDN;
+    using it beats stitching the legacy mapid/token URL by hand.
+    """
+
+    return image.getMapId(vis_params)["tile_fetcher"].url_format
+
+
+def _build_thumb_url(
+    image: ee.Image, vis_params: Mapping[str, object], region: ee.Geometry
+) -> str:
+    """Build a public PNG thumbnail URL for quick previews."""
+
+    params = dict(vis_params)
+    params.update({"region": region, "dimensions": 768, "format": "png"})
+    return image.getThumbURL(params)
+
+
+def _layer_urls(
+    definition: LayerDefinition,
+    image: ee.Image,
+    region: ee.Geometry,
+    region_key: RegionKey,
+) -> Tuple[str, str]:
+    """Return (tile_url, thumb_url), consulting the URL cache before EE.
+
+    getMapId and getThumbURL are the slowest EE calls in the pipeline (seconds
+    each) and their results are deterministic per layer and region, so cache
+    hits skip both round-trips entirely.
+    """
+
+    key = url_cache.key_for(definition.id, region_key)
+    cached = url_cache.get(key)
+    if cached is not None:
+        return cached["tile_url"], cached["thumb_url"]
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        tile_future = executor.submit(_build_tile_url, image, definition.vis_params)
+        thumb_future = executor.submit(
+            _build_thumb_url, image, definition.vis_params, region
+        )
+        tile_url = tile_future.result()
+        thumb_url = thumb_future.result()
+
+    url_cache.set(key, {"tile_url": tile_url, "thumb_url": thumb_url})
+    return tile_url, thumb_url
+
+
+def _build_layer_result(
+    definition: LayerDefinition,
+    batch_results: Dict[str, object],
+    tile_url: str,
+    thumb_url: str,
+) -> LayerResult:
+    statistics, classification_summary = _layer_metrics(definition, batch_results)
+    preview = LayerPreview.model_construct(
+        **_PREVIEW_TEMPLATES[definition.id],
+        thumb_url=thumb_url,
+        tile_url_template=tile_url,
+    )
+    return LayerResult(
+        layer=preview,
+        statistics=statistics,
+        classification_summary=classification_summary,
+    )
+
+
+def run_analysis(request: AnalysisRequest) -> AnalysisResponse:
+    """Evaluate every layer definition over the requested region."""
+
+    region = _create_analysis_region(request)
+    ctx = build_layer_context(region)
+    region_key = _region_key(request)
+
+    # Building the per-layer expressions is pure client-side graph assembly;
+    # only the batched reduction and the tile/thumb URLs hit the network.
+    layer_images = [definition.compute(region, ctx) for definition in LAYER_DEFINITIONS]
+
+    with ThreadPoolExecutor(max_workers=_MAX_LAYER_WORKERS) as executor:
+        batch_future = executor.submit(
+            _reduce_all_layers, layer_images, region, request.buffer_meters
+        )
+        url_futures = [
+            executor.submit(_layer_urls, definition, image, region, region_key)
+            for definition, image in zip(LAYER_DEFINITIONS, layer_images)
+        ]
+        area_sqkm, batch_results = batch_future.result()
+        layers = [
+            _build_layer_result(definition, batch_results, *url_future.result())
+            for definition, url_future in zip(LAYER_DEFINITIONS, url_futures)
+        ]
+
+    return AnalysisResponse(
+        requested_at=datetime.now(timezone.utc),
+        region_area_sqkm=area_sqkm,
+        layers=layers,
+    )
@@ -1,56 +1,342 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
+from functools import lru_cache
 from math import pi
-from typing import Callable, Dict, List, Optional
+from types import MappingProxyType
+from typing import Callable, List, Mapping, Tuple
 
 import ee
 
-# استيراد مطلق (مهم جداً)
-from ee_client import initialize_earth_engine
 
-initialize_earth_engine()
+@dataclass(frozen=True)
+class LayerContext:
+    """Shared per-region subexpressions reused across layer computations.
 
+    Hoisting these out of the individual compute functions means the slope
+    and log-flow expressions appear once in the serialized EE request instead
+    of once per layer that needs them.
+    """
+
+    region: ee.Geometry
+    slope: ee.Image
+    log_flow: ee.Image
+    ndvi: ee.Image
 
-@dataclass(frozen=True)
-class ComputedLayer:
-    image: ee.Image
-    vis_params: Dict[str, object]
-    scale: int
-    classification_image: Optional[ee.Image] = None
+
+def build_layer_context(region: ee.Geometry) -> LayerContext:
+    return LayerContext(
+        region=region,
+        slope=ee.Terrain.slope(_srtm()).clip(region),
+        log_flow=_flow_acc().clip(region).add(1).log10(),
+        ndvi=compute_ndvi(region),
+    )
 
 
 @dataclass(frozen=True)
 class LayerDefinition:
+    """A layer's static metadata plus the pure EE expression that computes it.
+
+    ``compute`` only assembles a deferred ee.Image — no Python-side branching
+    and no round-trips — so the full set of layers can be stacked into one
+    server-side DAG where EE deduplicates shared subexpressions. The image's
+    band is renamed to ``id``; ``classified`` marks layers that also get the
+    three-class percentage breakdown.
+    """
+
     id: str
     name: str
     description: str
     units: str
-    palette: List[str]
+    palette: Tuple[str, ...]
     min_value: float
     max_value: float
     scale: int
-    compute: Callable[[ee.Geometry], ComputedLayer]
+    vis_params: Mapping[str, object]
+    compute: Callable[[ee.Geometry, LayerContext], ee.Image]
+    classified: bool = True
 
 # -----------------------------
 # باقي الكود كما هو بدون تعديل
 # -----------------------------
 
-SRTM = ee.Image("USGS/SRTMGL1_003").select("elevation")
-FLOW_ACC = ee.Image("WWF/HydroSHEDS/15ACC").select(0).rename("accumulation")
-RAINFALL = (
-    ee.ImageCollection("UCSB-CHG/CHIRPS/DAILY")
-    .filterDate("2020-01-01", "2023-12-31")
-    .mean()
-    .select("precipitation")
-)
-
-SENTINEL2 = (
-    ee.ImageCollection("COPERNICUS/S2")
-    .filterDate("2023-01-01", "2023-12-31")
-    .filter(ee.Filter.lt("CLOUDY_PIXEL_PERCENTAGE", 30))
-)
-
-CLAY = ee.Image("OpenLandMap/SOL/SOL_CLAY-WFRACTION_USDA-3A1A1A_M/v02").select(0).rename("clay")
-SAND = ee.Image("OpenLandMap/SOL/SOL_SAND-WFRACTION_USDA-3A1A1A_M/v02").select(0).rename("sand")
-ORGANIC = ee.Image("OpenLandMap/SOL/SOL_ORGANIC-CARBON_USDA-6A1C_M/v02").select(0).rename("organic")
+# Source imagery, built lazily so importing this module does not require an
+# initialised Earth Engine client. Each helper constructs its expression once.
+#
+# The 2023 study window is fixed, so the two expensive composites — the median
+# NDVI over a year of low-cloud Sentinel-2 scenes and the CHIRPS 2020-2023
+# daily mean — were materialised once with ee.batch.Export.image.toAsset and
+# are now plain asset reads instead of per-request server-side reductions.
+NDVI_2023_ASSET = "projects/ee-bensefiasofian/assets/ndvi_2023_algeria_median"
+CHIRPS_MEAN_ASSET = "projects/ee-bensefiasofian/assets/chirps_2020_2023_mean"
+
+
+@lru_cache(maxsize=1)
+def _srtm() -> ee.Image:
+    return ee.Image("USGS/SRTMGL1_003").select("elevation")
+
+
+@lru_cache(maxsize=1)
+def _flow_acc() -> ee.Image:
+    return ee.Image("WWF/HydroSHEDS/15ACC").select(0).rename("accumulation")
+
+
+@lru_cache(maxsize=1)
+def _rainfall() -> ee.Image:
+    return ee.Image(CHIRPS_MEAN_ASSET).rename("precipitation")
+
+
+@lru_cache(maxsize=1)
+def _ndvi_composite() -> ee.Image:
+    return ee.Image(NDVI_2023_ASSET).rename("ndvi")
+
+
+@lru_cache(maxsize=1)
+def _clay() -> ee.Image:
+    return ee.Image("OpenLandMap/SOL/SOL_CLAY-WFRACTION_USDA-3A1A1A_M/v02").select(0).rename("clay")
+
+
+@lru_cache(maxsize=1)
+def _sand() -> ee.Image:
+    return ee.Image("OpenLandMap/SOL/SOL_SAND-WFRACTION_USDA-3A1A1A_M/v02").select(0).rename("sand")
+
+
+@lru_cache(maxsize=1)
+def _organic() -> ee.Image:
+    return (
+        ee.Image("OpenLandMap/SOL/SOL_ORGANIC-CARBON_USDA-6A1C_M/v02").select(0).rename("organic")
+    )
+
+
+# Visualisation parameters are static per layer; freeze them once at import
+# instead of rebuilding a dict and palette list on every request.
+_VIS_TOPOGRAPHIC_SUITABILITY = MappingProxyType({"min": 0, "max": 100, "palette": ("#d73027", "#fee08b", "#1a9850")})
+_VIS_SOLID_ROCK = MappingProxyType({"min": 0, "max": 100, "palette": ("#f7f4f9", "#998ec3", "#542788")})
+_VIS_WATER_STORAGE_CAPACITY = MappingProxyType({"min": 0, "max": 100, "palette": ("#fff7fb", "#74a9cf", "#023858")})
+_VIS_WATER_ACCUMULATION = MappingProxyType({"min": 0, "max": 100, "palette": ("#f7fbff", "#6baed6", "#08306b")})
+_VIS_DRAINAGE_DENSITY = MappingProxyType({"min": 0, "max": 100, "palette": ("#ffffe5", "#41b6c4", "#081d58")})
+_VIS_RUNOFF_POTENTIAL = MappingProxyType({"min": 0, "max": 100, "palette": ("#ffffcc", "#fd8d3c", "#800026")})
+_VIS_RAINFALL = MappingProxyType({"min": 0, "max": 600, "palette": ("#ffffd9", "#7fcdbb", "#225ea8")})
+_VIS_SOIL_STABILITY = MappingProxyType({"min": 0, "max": 100, "palette": ("#fff5eb", "#fd8d3c", "#7f2704")})
+_VIS_VEGETATION_COVER = MappingProxyType({"min": 0, "max": 100, "palette": ("#f7fcf5", "#74c476", "#00441b")})
+_VIS_WILDLIFE_IMPACT = MappingProxyType({"min": 0, "max": 100, "palette": ("#ffffe5", "#d9f0a3", "#004529")})
+_VIS_UNDISTURBED_AREAS = MappingProxyType({"min": 0, "max": 100, "palette": ("#fcfbfd", "#9e9ac8", "#3f007d")})
+
+
+def compute_ndvi(region: ee.Geometry) -> ee.Image:
+    """NDVI for the region, read from the precomputed 2023 composite asset."""
+
+    return _ndvi_composite().clip(region)
+
+
+def compute_topographic_suitability(region: ee.Geometry, ctx: LayerContext) -> ee.Image:
+    slope = ctx.slope
+    percentage = (
+        slope.multiply(-1).add(30).divide(30).clamp(0, 1).multiply(100)
+        .rename("topographic_suitability")
+    )
+    return percentage
+
+
+def compute_solid_rock(region: ee.Geometry, ctx: LayerContext) -> ee.Image:
+    slope = ctx.slope
+    percentage = slope.divide(45).clamp(0, 1).multiply(100).rename("solid_rock")
+    return percentage
+
+
+def compute_water_storage_capacity(region: ee.Geometry, ctx: LayerContext) -> ee.Image:
+    slope = ctx.slope
+    log_flow = ctx.log_flow
+    flatness = slope.multiply(-1).add(20).divide(20).clamp(0, 1)
+    accumulation = log_flow.divide(6).clamp(0, 1)
+    percentage = flatness.multiply(accumulation).multiply(100).rename("water_storage_capacity")
+    return percentage
+
+
+def compute_water_accumulation(region: ee.Geometry, ctx: LayerContext) -> ee.Image:
+    log_flow = ctx.log_flow
+    percentage = log_flow.divide(6).clamp(0, 1).multiply(100).rename("water_accumulation")
+    return percentage
+
+
+def compute_drainage_density(region: ee.Geometry, ctx: LayerContext) -> ee.Image:
+    log_flow = ctx.log_flow
+    percentage = log_flow.unitScale(2, 6).clamp(0, 1).multiply(100).rename("drainage_density")
+    return percentage
+
+
+def compute_runoff_potential(region: ee.Geometry, ctx: LayerContext) -> ee.Image:
+    log_flow = ctx.log_flow
+    rainfall = _rainfall().clip(region).divide(5).clamp(0, 1)
+    accumulation = log_flow.divide(6).clamp(0, 1)
+    percentage = rainfall.multiply(accumulation).multiply(100).rename("runoff_potential")
+    return percentage
+
+
+def compute_rainfall(region: ee.Geometry, ctx: LayerContext) -> ee.Image:
+    annual = _rainfall().clip(region).multiply(365).rename("rainfall")
+    return annual
+
+
+def compute_soil_stability(region: ee.Geometry, ctx: LayerContext) -> ee.Image:
+    percentage = (
+        _clay().add(_organic()).subtract(_sand().multiply(0.5)).clamp(0, 100)
+        .rename("soil_stability")
+        .clip(region)
+    )
+    return percentage
+
+
+def compute_vegetation_cover(region: ee.Geometry, ctx: LayerContext) -> ee.Image:
+    ndvi = ctx.ndvi
+    percentage = ndvi.clamp(0, 1).multiply(100).rename("vegetation_cover")
+    return percentage
+
+
+def compute_wildlife_impact(region: ee.Geometry, ctx: LayerContext) -> ee.Image:
+    ndvi = ctx.ndvi
+    percentage = ndvi.unitScale(0.2, 0.8).clamp(0, 1).multiply(100).rename("wildlife_impact")
+    return percentage
+
+
+def compute_undisturbed_areas(region: ee.Geometry, ctx: LayerContext) -> ee.Image:
+    ndvi = ctx.ndvi
+    percentage = ndvi.unitScale(0.1, 0.6).clamp(0, 1).multiply(100).rename("undisturbed_areas")
+    return percentage
+
+
+LAYER_DEFINITIONS: List[LayerDefinition] = [
+    LayerDefinition(
+        id="topographic_suitability",
+        name="Topographic Suitability",
+        description="Suitability of the terrain for a reservoir based on slope gentleness.",
+        units="%",
+        palette=("#d73027", "#fee08b", "#1a9850"),
+        min_value=0,
+        max_value=100,
+        scale=30,
+        vis_params=_VIS_TOPOGRAPHIC_SUITABILITY,
+        compute=compute_topographic_suitability,
+    ),
+    LayerDefinition(
+        id="solid_rock",
+        name="Solid Rock Exposure",
+        description="Likelihood of exposed bedrock suitable for dam anchoring, derived from slope.",
+        units="%",
+        palette=("#f7f4f9", "#998ec3", "#542788"),
+        min_value=0,
+        max_value=100,
+        scale=30,
+        vis_params=_VIS_SOLID_ROCK,
+        compute=compute_solid_rock,
+    ),
+    LayerDefinition(
+        id="water_storage_capacity",
+        name="Water Storage Capacity",
+        description="Combined flatness and upstream accumulation indicating storage potential.",
+        units="%",
+        palette=("#fff7fb", "#74a9cf", "#023858"),
+        min_value=0,
+        max_value=100,
+        scale=500,
+        vis_params=_VIS_WATER_STORAGE_CAPACITY,
+        compute=compute_water_storage_capacity,
+    ),
+    LayerDefinition(
+        id="water_accumulation",
+        name="Water Accumulation",
+        description="Log-scaled HydroSHEDS flow accumulation within the region.",
+        units="%",
+        palette=("#f7fbff", "#6baed6", "#08306b"),
+        min_value=0,
+        max_value=100,
+        scale=500,
+        vis_params=_VIS_WATER_ACCUMULATION,
+        compute=compute_water_accumulation,
+    ),
+    LayerDefinition(
+        id="drainage_density",
+        name="Drainage Density",
+        description="Relative density of the drainage network derived from flow accumulation.",
+        units="%",
+        palette=("#ffffe5", "#41b6c4", "#081d58"),
+        min_value=0,
+        max_value=100,
+        scale=500,
+        vis_params=_VIS_DRAINAGE_DENSITY,
+        compute=compute_drainage_density,
+    ),
+    LayerDefinition(
+        id="runoff_potential",
+        name="Runoff Potential",
+        description="Rainfall intensity weighted by upstream accumulation.",
+        units="%",
+        palette=("#ffffcc", "#fd8d3c", "#800026"),
+        min_value=0,
+        max_value=100,
+        scale=5000,
+        vis_params=_VIS_RUNOFF_POTENTIAL,
+        compute=compute_runoff_potential,
+    ),
+    LayerDefinition(
+        id="rainfall",
+        name="Annual Rainfall",
+        description="Mean annual precipitation from CHIRPS (2020-2023).",
+        units="mm/year",
+        palette=("#ffffd9", "#7fcdbb", "#225ea8"),
+        min_value=0,
+        max_value=600,
+        scale=5000,
+        vis_params=_VIS_RAINFALL,
+        compute=compute_rainfall,
+        classified=False,
+    ),
+    LayerDefinition(
+        id="soil_stability",
+        name="Soil Stability",
+        description="Soil stability index combining clay, sand and organic carbon fractions.",
+        units="%",
+        palette=("#fff5eb", "#fd8d3c", "#7f2704"),
+        min_value=0,
+        max_value=100,
+        scale=250,
+        vis_params=_VIS_SOIL_STABILITY,
+        compute=compute_soil_stability,
+    ),
+    LayerDefinition(
+        id="vegetation_cover",
+        name="Vegetation Cover",
+        description="Vegetation cover percentage from the 2023 Sentinel-2 NDVI composite.",
+        units="%",
+        palette=("#f7fcf5", "#74c476", "#00441b"),
+        min_value=0,
+        max_value=100,
+        scale=10,
+        vis_params=_VIS_VEGETATION_COVER,
+        compute=compute_vegetation_cover,
+    ),
+    LayerDefinition(
+        id="wildlife_impact",
+        name="Wildlife Impact",
+        description="Potential impact on wildlife habitats inferred from vegetation density.",
+        units="%",
+        palette=("#ffffe5", "#d9f0a3", "#004529"),
+        min_value=0,
+        max_value=100,
+        scale=10,
+        vis_params=_VIS_WILDLIFE_IMPACT,
+        compute=compute_wildlife_impact,
+    ),
+    LayerDefinition(
+        id="undisturbed_areas",
+        name="Undisturbed Areas",
+        description="Areas showing little human disturbance, inferred from NDVI levels.",
+        units="%",
+        palette=("#fcfbfd", "#9e9ac8", "#3f007d"),
+        min_value=0,
+        max_value=100,
+        scale=10,
+        vis_params=_VIS_UNDISTURBED_AREAS,
+        compute=compute_undisturbed_areas,
+    ),
+]
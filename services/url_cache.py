@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+
+import redis
+from cachetools import TTLCache
+
+# استيراد مطلق
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Tile and thumbnail URLs are deterministic for a given layer definition and
+# region, and EE keeps staged maps alive for about a day.
+_TTL_SECONDS = 24 * 3600
+
+
+class UrlCache:
+    """Cache of {tile_url, thumb_url} entries keyed by layer and region.
+
+    Entries always live in a process-local TTL cache; when ``REDIS_URL`` is
+    configured they are additionally written through to Redis so cached URLs
+    survive restarts and are shared between workers.
+    """
+
+    def __init__(self) -> None:
+        self._local: TTLCache = TTLCache(maxsize=1024, ttl=_TTL_SECONDS)
+        self._lock = threading.Lock()
+        self._redis: Optional[redis.Redis] = None
+
+    def connect(self) -> None:
+        """Open the Redis connection if one is configured. Called from lifespan."""
+
+        if not settings.redis_url:
+            logger.info("REDIS_URL not set; URL cache is process-local only.")
+            return
+        try:
+            client = redis.Redis.from_url(settings.redis_url, decode_responses=True)
+            client.ping()
+        except redis.RedisError:
+            logger.exception("Could not reach Redis; falling back to local URL cache.")
+            return
+        self._redis = client
+
+    def disconnect(self) -> None:
+        if self._redis is not None:
+            self._redis.close()
+            self._redis = None
+
+    @staticmethod
+    def key_for(definition_id: str, region_key: Tuple[float, float, int]) -> str:
+        lat, lon, buffer_m = region_key
+        payload = json.dumps(
+            {"id": definition_id, "lat": lat, "lon": lon, "buf": buffer_m},
+            sort_keys=True,
+        )
+        return "urls:" + hashlib.sha1(payload.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, str]]:
+        with self._lock:
+            cached = self._local.get(key)
+        if cached is not None:
+            return cached
+        if self._redis is not None:
+            try:
+                raw = self._redis.get(key)
+            except redis.RedisError:
+                logger.warning("Redis read failed for %s; treating as miss.", key)
+                return None
+            if raw is not None:
+                urls = json.loads(raw)
+                with self._lock:
+                    self._local[key] = urls
+                return urls
+        return None
+
+    def set(self, key: str, urls: Dict[str, str]) -> None:
+        with self._lock:
+            self._local[key] = urls
+        if self._redis is not None:
+            try:
+                self._redis.setex(key, _TTL_SECONDS, json.dumps(urls))
+            except redis.RedisError:
+                logger.warning("Redis write failed for %s; kept local copy only.", key)
+
+
+url_cache = UrlCache()